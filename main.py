@@ -14,27 +14,377 @@ import machine
 import time
 import json
 import dht
+import asyncio
+import micropython
+from micropython import const
 import gc  # Garbage collection for stability
 
 # Boot delay for hardware stabilization
 print("=== ESP32 Storm Sensor System Starting ===")
 time.sleep(2)  # Give DHT11 and other components time to stabilize
 
+# Let automatic collections run once a quarter of the free heap is used,
+# keeping each pause short instead of waiting for the heap to fill
+gc.threshold(gc.mem_free() // 4 + gc.mem_alloc())
+
 # Configuration
 WIFI_SSID = "AdrianWiFi"
 WIFI_PASSWORD = "bbbbbbbb"
+SENSOR_INTERVAL_MS = const(250)  # Background sensor/antenna logic period
+DHT11_INTERVAL_MS = const(1500)  # Minimum time between DHT11 measurements (~1 Hz sensor)
+MAX_REQUEST_LINE = const(256)  # Longest request line accepted - every endpoint is well under 80 bytes
+SEND_CHUNK = const(1400)  # Largest single socket write - about one TCP segment
+KEEPALIVE_IDLE_MS = const(5000)  # Close idle keep-alive connections after this long (page polls every 3 s)
+MAX_HEADER_BYTES = const(2048)  # Most request bytes read before giving up on the blank line - also bounds the header count
+GC_FREE_BYTES = const(16384)  # Collect after a request only when free heap is below this
+LOW_MEMORY_BYTES = const(20000)  # Warn when free heap is still below this after collecting
+DEBUG = False  # Print every output change - UART writes are slow enough to show in request latency
+FAST_GPIO = True  # Batch GPIO reads/writes via registers - classic ESP32 only (not S2/S3/C3)
 
 # Pin Configuration - CORRECTED FOR YOUR HARDWARE
 # INPUTS (Sensors) - Using available pins
-PIR_PIN = 4          # Person presence sensor (HIGH = person detected)
-STORM_PIN = 5        # Storm sensor (HIGH = storm detected) - moved from pin 0
-DHT11_PIN = 18       # DHT11 temperature/humidity sensor data pin
+PIR_PIN = const(4)          # Person presence sensor (HIGH = person detected)
+STORM_PIN = const(5)        # Storm sensor (HIGH = storm detected) - moved from pin 0
+DHT11_PIN = const(18)       # DHT11 temperature/humidity sensor data pin
 
 # OUTPUTS (Controlled devices) - CORRECTED
-ANTENNA_PIN = 19     # Antenna relay (HIGH = antenna connected) - moved from pin 2
-LED1_PIN = 0         # LED 1 (Storm indicator) - LOW = ON
-LED2_PIN = 15         # LED 2 (Clouds indicator) - LOW = ON  
-LED3_PIN = 2        # LED 3 (On Air indicator) - LOW = ON
+ANTENNA_PIN = const(19)     # Antenna relay (HIGH = antenna connected) - moved from pin 2
+LED1_PIN = const(0)         # LED 1 (Storm indicator) - LOW = ON
+LED2_PIN = const(15)         # LED 2 (Clouds indicator) - LOW = ON  
+LED3_PIN = const(2)        # LED 3 (On Air indicator) - LOW = ON
+
+# Output slots in the last-written pin value cache
+_OUT_STORM_LED = const(0)
+_OUT_CLOUDS_LED = const(1)
+_OUT_ON_AIR_LED = const(2)
+_OUT_ANTENNA = const(3)
+
+# Output pin bit per slot, and the ESP32 GPIO_OUT_W1TS/W1TC registers (write 1 to set/clear)
+_OUT_MASKS = (1 << LED1_PIN, 1 << LED2_PIN, 1 << LED3_PIN, 1 << ANTENNA_PIN)
+_GPIO_OUT_W1TS = const(0x3FF44008)
+_GPIO_OUT_W1TC = const(0x3FF4400C)
+_GPIO_IN_REG = const(0x3FF4403C)
+
+@micropython.viper
+def _read_gpio_in() -> int:
+    """Read the level of every GPIO 0-31 in one register load"""
+    return int(ptr32(_GPIO_IN_REG)[0])
+
+@micropython.viper
+def _decide(presence: int, storm: int, clouds: int) -> int:
+    """Branchless control decision: bit 0 = antenna on, bit 1 = storm LED value, bit 2 = clouds LED value"""
+    no_storm = storm ^ 1
+    # LEDs use inverted logic (LOW = ON), so each LED value is the inverted input
+    return (presence & no_storm) | (no_storm << 1) | ((clouds ^ 1) << 2)
+
+def _text_response(message, status="200 OK", connection="keep-alive"):
+    """Build a complete plain-text HTTP response, encoded once at import"""
+    return ("HTTP/1.1 %s\r\nContent-Type: text/plain\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n%s"
+            % (status, len(message), connection, message)).encode('utf-8')
+
+@micropython.native
+def _find(buf, byte, start, end):
+    """Index of byte in buf[start:end], or -1 - the receive buffer is a bytearray without find()"""
+    for i in range(start, end):
+        if buf[i] == byte:
+            return i
+    return -1
+
+@micropython.native
+def _blank_line(buf, start, end, state):
+    """Index of the newline ending a blank line in buf[start:end], else -1 if the scan stopped
+    at the start of a line or -2 mid-line - pass that back in as state for the next piece"""
+    for i in range(start, end):
+        c = buf[i]
+        if c == 10:
+            if state == -1:
+                return i
+            state = -1
+        elif c != 13:
+            state = -2
+    return state
+
+def _digits(value):
+    """Number of decimal digits in a non-negative int"""
+    count = 1
+    value //= 10
+    while value:
+        count += 1
+        value //= 10
+    return count
+
+def _put_int(mv, pos, value):
+    """Write value's decimal digits into mv at pos without allocating a str - returns the end position"""
+    end = pos + _digits(value)
+    pos = end
+    while True:
+        pos -= 1
+        mv[pos] = 48 + value % 10
+        value //= 10
+        if not value:
+            return end
+
+def _put_header(mv, prefix, length):
+    """Write a header prefix, its Content-Length value and the blank line into mv - returns the end position"""
+    end = len(prefix)
+    mv[:end] = prefix
+    end = _put_int(mv, end, length)
+    mv[end:end + 4] = _HDR_END
+    return end + 4
+
+async def _send(writer, data):
+    """Write data in SEND_CHUNK slices without copying it"""
+    if len(data) <= SEND_CHUNK:
+        await writer.awrite(data)
+        return
+    mv = memoryview(data)
+    for off in range(0, len(data), SEND_CHUNK):
+        await writer.awrite(mv[off:off + SEND_CHUNK])
+
+# Keep-alive headers up to the Content-Length value - only the length is sent per request
+_HDR_HTML = b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nConnection: keep-alive\r\nContent-Length: "
+_HDR_JSON = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: keep-alive\r\nContent-Length: "
+_HDR_END = b"\r\n\r\n"
+
+# Pre-encoded responses for the fixed endpoints
+_R_ANTENNA_ON = _text_response("Antenna Connected")
+_R_ANTENNA_OFF = _text_response("Antenna Disconnected")
+_R_STORM_ON = _text_response("Storm LED ON")
+_R_STORM_OFF = _text_response("Storm LED OFF")
+_R_CLOUDS_ON = _text_response("Clouds LED ON")
+_R_CLOUDS_OFF = _text_response("Clouds LED OFF")
+_R_ON_AIR_ON = _text_response("On Air LED ON")
+_R_ON_AIR_OFF = _text_response("On Air LED OFF")
+_R_TEST_OUTPUTS = _text_response("Output test started")
+_R_TEST_INDIVIDUAL = _text_response("Individual LED test started")
+_R_RESET = _text_response("Manual overrides reset - back to automatic")
+_R_NOT_FOUND = _text_response("404 - Not Found", "404 NOT FOUND")
+_R_BAD_REQUEST = _text_response("400 - Bad Request", "400 BAD REQUEST", "close")
+_R_SERVER_ERROR = _text_response("Server Error", "500 INTERNAL SERVER ERROR", "close")
+
+# Static web page sections - only the sensor and info blocks between them change per request
+_HTML_HEAD = b"""<!DOCTYPE html>
+<html>
+<head>
+    <title>Enhanced Storm Sensor System</title>
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <style>
+        body { font-family: Arial, sans-serif; margin: 0; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; }
+        .container { max-width: 700px; margin: 0 auto; background: rgba(255,255,255,0.95); padding: 30px; border-radius: 15px; box-shadow: 0 8px 32px rgba(0,0,0,0.3); color: #333; }
+        .header { text-align: center; margin-bottom: 30px; }
+        .sensor { padding: 20px; margin: 10px 0; border-radius: 10px; display: flex; justify-content: space-between; align-items: center; font-size: 18px; font-weight: bold; }
+        .sensor-active { background: linear-gradient(135deg, #4CAF50, #45a049); color: white; box-shadow: 0 4px 15px rgba(76, 175, 80, 0.4); }
+        .sensor-inactive { background: linear-gradient(135deg, #f44336, #da190b); color: white; box-shadow: 0 4px 15px rgba(244, 67, 54, 0.4); }
+        .controls { text-align: center; margin: 30px 0; }
+        .control-section { margin: 20px 0; padding: 20px; background: #f8f9fa; border-radius: 10px; }
+        .btn { padding: 12px 24px; margin: 5px; border: none; border-radius: 8px; cursor: pointer; font-size: 16px; font-weight: bold; transition: transform 0.2s, box-shadow 0.2s; }
+        .btn:hover { transform: translateY(-2px); box-shadow: 0 4px 12px rgba(0,0,0,0.2); }
+        .btn-on { background: #4CAF50; color: white; }
+        .btn-off { background: #f44336; color: white; }
+        .btn-test { background: #FF9800; color: white; }
+        .btn-refresh { background: #2196F3; color: white; }
+        .status-bar { margin-top: 30px; padding: 20px; border-top: 3px solid #eee; font-size: 14px; color: #666; background: #f8f9fa; border-radius: 10px; }
+        .logic-box { background: #e3f2fd; padding: 15px; border-radius: 8px; margin: 15px 0; border-left: 4px solid #2196F3; }
+        .override-active { background: #fff3e0; border-left: 4px solid #FF9800; }
+        .pin-info { background: #fff3e0; padding: 10px; border-radius: 5px; font-size: 12px; margin: 10px 0; }
+        .weather-info { background: #e8f5e8; padding: 15px; border-radius: 8px; margin: 15px 0; border-left: 4px solid #4CAF50; }
+        .weather-data { display: flex; justify-content: space-between; margin: 10px 0; }
+        .weather-value { font-weight: bold; color: #2e7d32; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Enhanced Storm Sensor System</h1>
+            <p>Smart Antenna Control with Weather Monitoring</p>
+            <div class="pin-info">
+                <strong>Hardware:</strong> LEDs on pins 0, 2, 15 (LOW = ON) | Antenna on pin """ + str(ANTENNA_PIN).encode() + b""" | DHT11 on pin """ + str(DHT11_PIN).encode() + b"""
+            </div>
+        </div>
+        
+"""
+
+_HTML_MID = b"""        <div class="controls">
+            <div class="control-section">
+                <h3>Antenna Control</h3>
+                <button class="btn btn-on" onclick="controlDevice('antenna', 'on')">Connect Antenna</button>
+                <button class="btn btn-off" onclick="controlDevice('antenna', 'off')">Disconnect Antenna</button>
+            </div>
+            
+            <div class="control-section">  
+                <h3>LED Control (Persistent - LOW = ON)</h3>
+                <button class="btn btn-test" onclick="controlDevice('storm_led', 'on')">Storm LED ON (pin 0)</button>
+                <button class="btn btn-test" onclick="controlDevice('storm_led', 'off')">Storm LED OFF</button>
+                <br>
+                <button class="btn btn-test" onclick="controlDevice('clouds_led', 'on')">Weather LED ON (pin 2)</button>
+                <button class="btn btn-test" onclick="controlDevice('clouds_led', 'off')">Weather LED OFF</button>
+                <br>
+                <button class="btn btn-test" onclick="controlDevice('on_air_led', 'on')">On Air LED ON (pin 15)</button>
+                <button class="btn btn-test" onclick="controlDevice('on_air_led', 'off')">On Air LED OFF</button>
+                <br>
+                <button class="btn btn-test" onclick="controlDevice('test_all', '')">Test All Outputs</button>
+                <button class="btn btn-test" onclick="controlDevice('test_individual', '')">Test Individual LEDs</button>
+            </div>
+            
+            <div class="control-section">
+                <h3>System Control</h3>
+                <button class="btn btn-refresh" onclick="location.reload()">Refresh Status</button>
+                <button class="btn btn-test" onclick="controlDevice('reset_overrides', '')">Reset Manual Overrides</button>
+            </div>
+        </div>
+        
+        <div class="status-bar">
+            <h4>System Information</h4>
+"""
+
+_HTML_TAIL = b"""            <p><strong>Control Logic:</strong></p>
+            <ul style="text-align: left; margin: 10px 0;">
+                <li><strong>Storm = Antenna OFF</strong> (safety first!)</li>
+                <li><strong>No Person = Antenna OFF</strong> (no need)</li>
+                <li><strong>Person + No Storm = Antenna ON</strong> (even if cloudy)</li>
+            </ul>
+            <p><strong>Manual Override System:</strong></p>
+            <ul style="text-align: left; margin: 10px 0; font-size: 12px;">
+                <li>Manual LED/antenna control persists until reset</li>
+                <li>Overridden components ignore sensor readings</li>
+                <li>Use "Reset Manual Overrides" to return to automatic</li>
+            </ul>
+        </div>
+    </div>
+    
+    <script>
+        function controlDevice(device, action) {
+            let url = '';
+            if (device === 'antenna') {
+                url = '/antenna/' + action;
+            } else if (device.includes('led')) {
+                url = '/led/' + device.replace('_led', '') + '/' + action;
+            } else if (device === 'test_all') {
+                url = '/test/outputs';
+            } else if (device === 'test_individual') {
+                url = '/test/individual';
+            } else if (device === 'reset_overrides') {
+                url = '/reset/overrides';
+            }
+            
+            if (url) {
+                fetch(url)
+                    .then(response => response.text())
+                    .then(result => {
+                        console.log('Control result:', result);
+                        setTimeout(refreshState, 500);
+                    })
+                    .catch(err => console.log('Control error:', err));
+            }
+        }
+        
+        function setSensor(id, active, text) {
+            document.getElementById(id + '-box').className = 'sensor ' + (active ? 'sensor-active' : 'sensor-inactive');
+            document.getElementById(id).innerText = text;
+        }
+        
+        async function refreshState() {
+            try {
+                const s = await (await fetch('/api/state')).json();
+                setSensor('presence', s.presence, s.presence ? 'YES' : 'NO');
+                setSensor('storm', s.storm, s.storm ? 'YES' : 'NO');
+                setSensor('clouds', s.clouds, s.clouds ? 'YES' : 'NO');
+                setSensor('antenna', s.antenna_connected, s.antenna_connected ? 'CONNECTED' : 'DISCONNECTED');
+                setSensor('on-air', s.on_air, s.on_air ? 'ON AIR' : 'OFF AIR');
+                document.getElementById('temp').innerText = s.temperature !== null ? s.temperature + '\\u00b0C' : 'Error';
+                document.getElementById('humidity').innerText = s.humidity !== null ? s.humidity + '%' : 'Error';
+                document.getElementById('weather-status').innerText = s.weather_status;
+                document.getElementById('uptime').innerText = Math.floor(s.timestamp / 1000);
+                
+                const overrides = Object.keys(s.manual_overrides || {})
+                    .filter(k => s.manual_overrides[k])
+                    .map(k => k.replace(/_/g, ' ').toUpperCase());
+                const logic = document.getElementById('logic');
+                logic.className = overrides.length ? 'logic-box override-active' : 'logic-box';
+                logic.innerHTML = '<strong>Current Logic:</strong> ' + s.control_reason +
+                    (overrides.length ? '<br><strong>Manual Overrides Active:</strong> ' + overrides.join(', ') : '');
+            } catch (err) {
+                console.log('State error:', err);
+            }
+        }
+        
+        // Poll the small JSON state every 3 seconds instead of reloading the whole page
+        setInterval(refreshState, 3000);
+    </script>
+</body>
+</html>"""
+
+# Sensor box class and label, indexed by the sensor flag
+_CLASS = ("sensor-inactive", "sensor-active")
+_YN = ("NO", "YES")
+_ANT = ("DISCONNECTED", "CONNECTED")
+_AIR = ("OFF AIR", "ON AIR")
+
+# Per-state page templates - filled by _render_status() and _render_info()
+_STATUS_TEMPLATE = """        <div id="presence-box" class="sensor %s">
+            <span>Person Detected</span>
+            <span id="presence">%s</span>
+        </div>
+        
+        <div id="storm-box" class="sensor %s">
+            <span>Storm Detected</span>
+            <span id="storm">%s</span>
+        </div>
+        
+        <div id="clouds-box" class="sensor %s">
+            <span>Poor Weather (DHT11)</span>
+            <span id="clouds">%s</span>
+        </div>
+        
+        <div id="antenna-box" class="sensor %s">
+            <span>Antenna Status</span>
+            <span id="antenna">%s</span>
+        </div>
+        
+        <div id="on-air-box" class="sensor %s">
+            <span>On Air Status</span>
+            <span id="on-air">%s</span>
+        </div>
+        
+        <div class="weather-info">
+            <h3 style="margin-top: 0;">DHT11 Weather Data</h3>
+            <div class="weather-data">
+                <span>Temperature:</span>
+                <span id="temp" class="weather-value">%s</span>
+            </div>
+            <div class="weather-data">
+                <span>Humidity:</span>
+                <span id="humidity" class="weather-value">%s</span>
+            </div>
+            <div id="weather-status" style="margin-top: 10px; font-size: 14px; font-style: italic;">
+                %s
+            </div>
+        </div>
+        
+        <div id="logic" class="%s">
+            <strong>Current Logic:</strong> %s
+        </div>
+        
+"""
+
+_INFO_HEAD_TEMPLATE = """            <p><strong>IP Address:</strong> %s</p>
+            <p><strong>Uptime:</strong> <span id="uptime">"""
+
+_INFO_TAIL_TEMPLATE = """</span> seconds</p>
+            <p><strong>Pin Configuration (DHT11 INTEGRATION):</strong></p>
+            <ul style="text-align: left; margin: 10px 0; font-size: 12px;">
+                <li>Storm LED: GPIO """ + str(LED1_PIN) + """ (LOW = ON)</li>
+                <li>Clouds LED: GPIO """ + str(LED2_PIN) + """ (LOW = ON)</li>
+                <li>On Air LED: GPIO """ + str(LED3_PIN) + """ (LOW = ON)</li>
+                <li>Antenna Relay: GPIO """ + str(ANTENNA_PIN) + """ (HIGH = ON)</li>
+                <li>DHT11 Sensor: GPIO """ + str(DHT11_PIN) + """ (Temp & Humidity)</li>
+            </ul>
+            <p><strong>Weather Thresholds:</strong></p>
+            <ul style="text-align: left; margin: 10px 0; font-size: 12px;">
+                <li>Poor Weather: Humidity >%s%% OR Temp <%s°C OR >%s°C</li>
+                <li>Good Weather: Normal temp/humidity ranges</li>
+            </ul>
+"""
 
 class EnhancedStormSensor:
     def __init__(self):
@@ -50,6 +400,10 @@ class EnhancedStormSensor:
             print(f"DHT11 initialization error: {e}")
             self.dht11_sensor = None
         
+        # Last DHT11 reading (temperature, humidity, status) - backdated so the first read measures
+        self._dht_cache = (None, None, "No reading yet")
+        self._dht_last_ts = time.ticks_add(time.ticks_ms(), -10000)
+        
         # Weather thresholds
         self.humidity_threshold = 80  # Above 80% = high chance of clouds/rain
         self.temp_min = 5            # Below 5°C = poor weather
@@ -67,17 +421,96 @@ class EnhancedStormSensor:
         self.storm_led.value(1)        # Storm LED OFF (HIGH = OFF for LEDs)
         self.clouds_led.value(1)       # Clouds LED OFF (HIGH = OFF for LEDs)
         
+        # Last value written to each output - see _set()
+        self._last = [1, 1, 1, 0]
+        
+        # Output changes queued by _stage(), applied together by _flush()
+        self._out_pins = (self.storm_led, self.clouds_led, self.on_air_led, self.antenna_relay)
+        self._set_mask = 0
+        self._clr_mask = 0
+        
+        # Output test table: (name, output slot, pin, ON value) - LEDs first
+        self._test_outputs = (
+            (f'Storm LED (pin {LED1_PIN})', _OUT_STORM_LED, self.storm_led, 0),
+            (f'Weather LED (pin {LED2_PIN})', _OUT_CLOUDS_LED, self.clouds_led, 0),
+            (f'On Air LED (pin {LED3_PIN})', _OUT_ON_AIR_LED, self.on_air_led, 0),
+            (f'Antenna Relay (pin {ANTENNA_PIN})', _OUT_ANTENNA, self.antenna_relay, 1)
+        )
+        self._testing = False
+        
+        # Background sensor loop - kept so a second run_server() (after a failed start) doesn't add another
+        self._sensor_task = None
+        
         # WiFi setup
         self.wlan = network.WLAN(network.STA_IF)
         self.ip_address = None
         
-        # Manual override states - persist until reset
+        # Manual override states - persist until reset, reported live in the sensors dict
         self.manual_override = {
             'storm_led': False,
             'clouds_led': False,
             'on_air_led': False,
             'antenna': False
         }
+        
+        # Sensor state - a single dict updated in place by read_sensors/update_logic
+        # Every key is always present, so readers can subscript instead of .get()
+        self._sensors = {
+            'presence': False,
+            'storm': False,
+            'clouds': False,
+            'antenna_connected': False,
+            'temperature': None,
+            'humidity': None,
+            'weather_status': "Unknown",
+            'dht_status': "No reading yet",
+            'timestamp': 0,
+            'control_reason': "Unknown",
+            'on_air': False,
+            'manual_overrides': self.manual_override
+        }
+        
+        # Antenna reasons indexed by (presence << 2) | (storm << 1) | clouds
+        self._reasons = ("No person detected", "No person detected",
+                         "No person detected", "No person detected",
+                         "Person present, clear weather (antenna ON)",
+                         "Person present, cloudy weather (antenna ON)",
+                         "Storm detected - safety first!", "Storm detected - safety first!")
+        
+        # Last rendered sensor block and the state it was rendered from - see generate_html()
+        self._status_key = None
+        self._status_html = b''
+        
+        # Cached JSON state up to the timestamp value - see _state_json_head()
+        self._json_key = None
+        self._json_head = b''
+        
+        # Reused buffer for response headers and whole JSON responses - see _header()
+        self._tx_buf = bytearray(1024)
+        self._tx_mv = memoryview(self._tx_buf)
+        
+        # Receive buffers handed back when a connection closes - connections overlap, so one each
+        self._rx_free = [bytearray(MAX_REQUEST_LINE)]
+        
+        # Info block split around the uptime, cached on the values it shows
+        self._info_key = None
+        self._info_head = b''
+        self._info_tail = b''
+        
+        # Control endpoints: path bytes -> (handler, args, pre-encoded response)
+        self._routes = {
+            b'/antenna/on': (self.control_antenna, (True,), _R_ANTENNA_ON),
+            b'/antenna/off': (self.control_antenna, (False,), _R_ANTENNA_OFF),
+            b'/led/storm/on': (self.control_led, ('storm', True), _R_STORM_ON),
+            b'/led/storm/off': (self.control_led, ('storm', False), _R_STORM_OFF),
+            b'/led/clouds/on': (self.control_led, ('clouds', True), _R_CLOUDS_ON),
+            b'/led/clouds/off': (self.control_led, ('clouds', False), _R_CLOUDS_OFF),
+            b'/led/on_air/on': (self.control_led, ('on_air', True), _R_ON_AIR_ON),
+            b'/led/on_air/off': (self.control_led, ('on_air', False), _R_ON_AIR_OFF),
+            b'/test/outputs': (self._start_test, (self.test_all_outputs,), _R_TEST_OUTPUTS),
+            b'/test/individual': (self._start_test, (self.test_individual_leds,), _R_TEST_INDIVIDUAL),
+            b'/reset/overrides': (self.reset_manual_overrides, (), _R_RESET)
+        }
     
     def set_weather_thresholds(self, humidity_max=80, temp_min=5, temp_max=35):
         """Adjust weather detection thresholds"""
@@ -99,36 +532,50 @@ class EnhancedStormSensor:
         print(f"Manual override system enabled - settings persist until reset")
         print(f"Weather thresholds: Humidity >{self.humidity_threshold}% = cloudy, Temp {self.temp_min}-{self.temp_max}°C")
         
-    def connect_wifi(self):
-        """Connect to WiFi network"""
+    async def connect_wifi(self):
+        """Connect to WiFi network without blocking the sensor loop"""
         self.wlan.active(True)
         
         if not self.wlan.isconnected():
             print("Connecting to WiFi...")
             self.wlan.connect(WIFI_SSID, WIFI_PASSWORD)
             
-            timeout = 15
-            while not self.wlan.isconnected() and timeout > 0:
-                time.sleep(1)
-                timeout -= 1
+            # Up to 15 s, but give up as soon as the driver stops trying
+            for _ in range(75):
+                await asyncio.sleep_ms(200)
+                if self.wlan.isconnected():
+                    break
+                if self.wlan.status() not in (network.STAT_CONNECTING, network.STAT_IDLE):
+                    break
         
         if self.wlan.isconnected():
             self.ip_address = self.wlan.ifconfig()[0]
-            self.on_air_led.value(0)  # On Air LED ON when WiFi connected (LOW = ON)
+            self._set(_OUT_ON_AIR_LED, self.on_air_led, 0)  # On Air LED ON when WiFi connected (LOW = ON)
             print(f"WiFi connected: {self.ip_address}")
             return True
         else:
             print("WiFi connection failed!")
             # Flash on air LED to indicate WiFi error
             for i in range(5):
-                self.on_air_led.value(0)  # LED ON (LOW = ON)
-                time.sleep(0.2)
-                self.on_air_led.value(1)  # LED OFF (HIGH = OFF)
-                time.sleep(0.2)
+                self._set(_OUT_ON_AIR_LED, self.on_air_led, 0)  # LED ON (LOW = ON)
+                await asyncio.sleep_ms(200)
+                self._set(_OUT_ON_AIR_LED, self.on_air_led, 1)  # LED OFF (HIGH = OFF)
+                await asyncio.sleep_ms(200)
             return False
     
-    def read_dht11(self):
-        """Read DHT11 sensor with error handling"""
+    def read_dht11(self, now=None):
+        """Read DHT11 sensor, reusing the last reading if it is less than DHT11_INTERVAL_MS old"""
+        if now is None:
+            now = time.ticks_ms()
+        if time.ticks_diff(now, self._dht_last_ts) < DHT11_INTERVAL_MS:
+            return self._dht_cache
+        
+        self._dht_last_ts = now
+        self._dht_cache = self._measure_dht11()
+        return self._dht_cache
+    
+    def _measure_dht11(self):
+        """Measure DHT11 sensor with error handling"""
         if not self.dht11_sensor:
             return None, None, "DHT11 not initialized"
         
@@ -149,15 +596,23 @@ class EnhancedStormSensor:
         except Exception as e:
             return None, None, f"DHT11 error: {str(e)}"
     
-    def read_sensors(self):
+    def read_sensors(self, now=None):
         """Read all sensor values including DHT11"""
+        if now is None:
+            now = time.ticks_ms()
         try:
-            presence = bool(self.pir_sensor.value())
-            storm = bool(self.storm_sensor.value())
-            antenna_connected = bool(self.antenna_relay.value())
+            if FAST_GPIO:
+                levels = _read_gpio_in()
+                presence = bool(levels & (1 << PIR_PIN))
+                storm = bool(levels & (1 << STORM_PIN))
+                antenna_connected = bool(levels & (1 << ANTENNA_PIN))
+            else:
+                presence = bool(self.pir_sensor.value())
+                storm = bool(self.storm_sensor.value())
+                antenna_connected = bool(self.antenna_relay.value())
             
             # Read DHT11 with error handling
-            temperature, humidity, dht_status = self.read_dht11()
+            temperature, humidity, dht_status = self.read_dht11(now)
             
             # Determine cloud conditions from humidity and temperature
             clouds = False
@@ -180,234 +635,286 @@ class EnhancedStormSensor:
             else:
                 weather_status = f"DHT11 error: {dht_status}"
             
-            return {
-                'presence': presence,
-                'storm': storm,
-                'clouds': clouds,
-                'antenna_connected': antenna_connected,
-                'temperature': temperature,
-                'humidity': humidity,
-                'weather_status': weather_status,
-                'dht_status': dht_status,
-                'timestamp': time.ticks_ms()
-            }
+            s = self._sensors
+            s['presence'] = presence
+            s['storm'] = storm
+            s['clouds'] = clouds
+            s['antenna_connected'] = antenna_connected
+            s['temperature'] = temperature
+            s['humidity'] = humidity
+            s['weather_status'] = weather_status
+            s['dht_status'] = dht_status
+            s['timestamp'] = now
+            return s
         except Exception as e:
             print(f"Sensor read error: {e}")
-            return {
-                'presence': False,
-                'storm': False,
-                'clouds': False,
-                'antenna_connected': False,
-                'temperature': None,
-                'humidity': None,
-                'weather_status': "Sensor error",
-                'dht_status': "Error",
-                'timestamp': time.ticks_ms()
-            }
+            s = self._sensors
+            s['presence'] = False
+            s['storm'] = False
+            s['clouds'] = False
+            s['antenna_connected'] = False
+            s['temperature'] = None
+            s['humidity'] = None
+            s['weather_status'] = "Sensor error"
+            s['dht_status'] = "Error"
+            s['timestamp'] = now
+            return s
     
-    def update_logic(self):
+    def update_logic(self, now=None):
         """Enhanced control logic with DHT11 weather analysis and manual override support"""
+        if now is None:
+            now = time.ticks_ms()
         try:
-            sensors = self.read_sensors()
+            # Hoist attribute lookups to locals - cheaper to access in the MicroPython VM
+            stage = self._stage
+            overrides = self.manual_override
+            
+            sensors = self.read_sensors(now)
             presence = sensors['presence']
             storm = sensors['storm']
             clouds = sensors['clouds']  # Now determined by DHT11 readings
             
+            # Decide all outputs at once from the three inputs
+            decision = _decide(presence, storm, clouds)
+            should_connect = bool(decision & 1)
+            storm_led_value = (decision >> 1) & 1
+            clouds_led_value = decision >> 2
+            reason = self._reasons[(presence << 2) | (storm << 1) | clouds]
+            
             # LED CONTROL - Only update if not manually overridden
-            if not self.manual_override['storm_led']:
-                self.storm_led.value(0 if storm else 1)      # LED1 (pin 0) = Storm sensor (LOW = ON)
+            if not overrides['storm_led']:
+                # LED1 (pin 0) = Storm sensor (LOW = ON)
+                if stage(_OUT_STORM_LED, storm_led_value):
+                    if DEBUG:
+                        print("Storm LED %s" % ('OFF' if storm_led_value else 'ON'))
             
-            if not self.manual_override['clouds_led']:
-                self.clouds_led.value(0 if clouds else 1)    # LED2 (pin 2) = Poor weather from DHT11 (LOW = ON)
+            if not overrides['clouds_led']:
+                # LED2 (pin 2) = Poor weather from DHT11 (LOW = ON)
+                if stage(_OUT_CLOUDS_LED, clouds_led_value):
+                    if DEBUG:
+                        print("Weather LED %s" % ('OFF' if clouds_led_value else 'ON'))
             
             # ANTENNA CONTROL LOGIC - Only if not manually overridden
-            if not self.manual_override['antenna']:
-                if not presence:
-                    should_connect = False
-                    reason = "No person detected"
-                elif storm:
-                    should_connect = False  
-                    reason = "Storm detected - safety first!"
-                elif presence and not storm:
-                    should_connect = True
-                    if clouds:
-                        weather_desc = sensors.get('weather_status', 'Poor weather')
-                        reason = f"Person present, {weather_desc} (antenna ON)"
-                    else:
-                        weather_desc = sensors.get('weather_status', 'Good weather')
-                        reason = f"Person present, {weather_desc} (antenna ON)"
-                else:
-                    should_connect = False
-                    reason = "Unknown condition"
-                
+            if not overrides['antenna']:
                 # Apply antenna control
-                current_state = sensors['antenna_connected']
-                if should_connect != current_state:
-                    self.antenna_relay.value(1 if should_connect else 0)
-                    print(f"Antenna {'ON' if should_connect else 'OFF'}: {reason}")
+                if stage(_OUT_ANTENNA, 1 if should_connect else 0):
+                    if DEBUG:
+                        print("Antenna %s: %s" % ('ON' if should_connect else 'OFF', reason))
                 
                 # ON AIR LED - Shows when antenna is actively connected (only if not overridden)
-                if not self.manual_override['on_air_led']:
-                    self.on_air_led.value(0 if should_connect else 1)  # LOW = ON
+                if not overrides['on_air_led']:
+                    stage(_OUT_ON_AIR_LED, 0 if should_connect else 1)  # LOW = ON
             else:
                 reason = "Manual override active"
                 should_connect = sensors['antenna_connected']
             
+            # Apply all output changes at once
+            self._flush()
+            
             # Update sensor data with reason
             sensors['control_reason'] = reason
             sensors['on_air'] = should_connect  # Add on_air status
-            sensors['manual_overrides'] = self.manual_override.copy()  # Add override info
             return sensors
             
         except Exception as e:
-            print(f"Logic update error: {e}")
-            return self.read_sensors()
+            print("Logic update error: %s" % e)
+            return self._sensors
+    
+    def _stage(self, idx, value):
+        """Queue an output change for _flush() - returns True if the value changed"""
+        if self._last[idx] == value:
+            return False
+        self._last[idx] = value
+        if value:
+            self._set_mask |= _OUT_MASKS[idx]
+        else:
+            self._clr_mask |= _OUT_MASKS[idx]
+        return True
+    
+    def _flush(self):
+        """Write all staged output changes - one set and one clear register write on ESP32"""
+        set_mask = self._set_mask
+        clr_mask = self._clr_mask
+        if not (set_mask or clr_mask):
+            return
+        self._set_mask = 0
+        self._clr_mask = 0
+        
+        if FAST_GPIO:
+            if set_mask:
+                machine.mem32[_GPIO_OUT_W1TS] = set_mask
+            if clr_mask:
+                machine.mem32[_GPIO_OUT_W1TC] = clr_mask
+        else:
+            for idx in range(4):
+                bit = _OUT_MASKS[idx]
+                if (set_mask | clr_mask) & bit:
+                    self._out_pins[idx].value(1 if set_mask & bit else 0)
+    
+    def _set(self, idx, pin, value):
+        """Write an output pin only when its value changes - returns True if it was written"""
+        if self._last[idx] == value:
+            return False
+        pin.value(value)
+        self._last[idx] = value
+        return True
     
     def control_antenna(self, connect, manual=True):
         """Manual antenna control with override flag"""
         try:
-            self.antenna_relay.value(1 if connect else 0)
+            self._set(_OUT_ANTENNA, self.antenna_relay, 1 if connect else 0)
+            self._sensors['antenna_connected'] = bool(connect)  # Show it before the next sensor loop pass
             if manual:
                 self.manual_override['antenna'] = True
                 self.manual_override['on_air_led'] = True  # Also override on air LED
-                self.on_air_led.value(0 if connect else 1)  # Update on air LED manually
-                print(f"Manual override: Antenna {'ON' if connect else 'OFF'}")
+                self._set(_OUT_ON_AIR_LED, self.on_air_led, 0 if connect else 1)  # Update on air LED manually
+                if DEBUG:
+                    print("Manual override: Antenna %s" % ('ON' if connect else 'OFF'))
         except Exception as e:
-            print(f"Antenna control error: {e}")
+            print("Antenna control error: %s" % e)
     
     def control_led(self, led_type, state):
         """Manual LED control for testing - INVERTED LOGIC with override"""
         try:
-            print(f"LED Control: {led_type} -> {'ON' if state else 'OFF'}")
+            if DEBUG:
+                print("LED Control: %s -> %s" % (led_type, 'ON' if state else 'OFF'))
             
             # Inverted logic: LOW = ON, HIGH = OFF
             led_value = 0 if state else 1
             
             if led_type == 'storm' or led_type == 'led1':
-                self.storm_led.value(led_value)
+                self._set(_OUT_STORM_LED, self.storm_led, led_value)
                 self.manual_override['storm_led'] = True
-                print(f"Storm LED (pin {LED1_PIN}) set to {'LOW (ON)' if state else 'HIGH (OFF)'} - MANUAL")
+                if DEBUG:
+                    print("Storm LED (pin %d) set to %s - MANUAL" % (LED1_PIN, 'LOW (ON)' if state else 'HIGH (OFF)'))
                 
             elif led_type == 'clouds' or led_type == 'led2':
-                self.clouds_led.value(led_value)
+                self._set(_OUT_CLOUDS_LED, self.clouds_led, led_value)
                 self.manual_override['clouds_led'] = True
-                print(f"Weather LED (pin {LED2_PIN}) set to {'LOW (ON)' if state else 'HIGH (OFF)'} - MANUAL")
+                if DEBUG:
+                    print("Weather LED (pin %d) set to %s - MANUAL" % (LED2_PIN, 'LOW (ON)' if state else 'HIGH (OFF)'))
                 
             elif led_type == 'on_air' or led_type == 'led3':
-                self.on_air_led.value(led_value)
+                self._set(_OUT_ON_AIR_LED, self.on_air_led, led_value)
                 self.manual_override['on_air_led'] = True
-                print(f"On Air LED (pin {LED3_PIN}) set to {'LOW (ON)' if state else 'HIGH (OFF)'} - MANUAL")
+                if DEBUG:
+                    print("On Air LED (pin %d) set to %s - MANUAL" % (LED3_PIN, 'LOW (ON)' if state else 'HIGH (OFF)'))
                 
             else:
-                print(f"Unknown LED type: {led_type}")
+                print("Unknown LED type: %s" % led_type)
                 
         except Exception as e:
-            print(f"LED control error: {e}")
+            print("LED control error: %s" % e)
     
     def reset_manual_overrides(self):
         """Reset all manual overrides back to automatic control"""
-        self.manual_override = {
-            'storm_led': False,
-            'clouds_led': False,
-            'on_air_led': False,
-            'antenna': False
-        }
-        print("All manual overrides reset - back to automatic control")
+        # Cleared in place - the sensors dict reports this same object
+        for key in self.manual_override:
+            self.manual_override[key] = False
+        if DEBUG:
+            print("All manual overrides reset - back to automatic control")
+    
+    async def _blink(self, idx, pin, name, on_value=0, count=1, on_ms=500, off_ms=500):
+        """Blink one output without blocking the event loop - one print per blink"""
+        set_pin = self._set
+        sleep_ms = asyncio.sleep_ms
+        for i in range(count):
+            print(f"  {name} ON/OFF")
+            set_pin(idx, pin, on_value)
+            await sleep_ms(on_ms)
+            set_pin(idx, pin, on_value ^ 1)
+            await sleep_ms(off_ms)
     
-    def test_all_outputs(self):
+    async def test_all_outputs(self):
         """Test all LEDs and antenna relay - INVERTED LED LOGIC"""
         print("Testing all outputs...")
-        outputs = [
-            (f'Storm LED (pin {LED1_PIN})', self.storm_led),
-            (f'Weather LED (pin {LED2_PIN})', self.clouds_led), 
-            (f'On Air LED (pin {LED3_PIN})', self.on_air_led),
-            (f'Antenna Relay (pin {ANTENNA_PIN})', self.antenna_relay)
-        ]
-        
-        for name, pin in outputs:
-            if 'LED' in name:
-                # Inverted logic for LEDs: LOW = ON
-                print(f"  {name} ON")
-                pin.value(0)  # LOW = ON
-                time.sleep(1)
-                print(f"  {name} OFF") 
-                pin.value(1)  # HIGH = OFF
-                time.sleep(0.5)
-            else:
-                # Normal logic for relay
-                print(f"  {name} ON")
-                pin.value(1)
-                time.sleep(1)
-                print(f"  {name} OFF") 
-                pin.value(0)
-                time.sleep(0.5)
-        
+        for name, idx, pin, on_value in self._test_outputs:
+            await self._blink(idx, pin, name, on_value, 1, 1000, 500)
         print("Output test complete!")
     
-    def test_individual_leds(self):
+    async def test_individual_leds(self):
         """Individual LED test function - INVERTED LOGIC"""
         print("=== Individual LED Test (INVERTED LOGIC) ===")
-        
-        # Test LED 1 (pin 0)
-        print("Testing LED 1 (Storm LED, pin 0)...")
-        for i in range(3):
-            self.storm_led.value(0)  # LOW = ON
-            print("  Storm LED ON")
-            time.sleep(0.5)
-            self.storm_led.value(1)  # HIGH = OFF
-            print("  Storm LED OFF")
-            time.sleep(0.5)
-        
-        # Test LED 2 (pin 2)  
-        print("Testing LED 2 (Weather LED, pin 2)...")
-        for i in range(3):
-            self.clouds_led.value(0)  # LOW = ON
-            print("  Weather LED ON")
-            time.sleep(0.5)
-            self.clouds_led.value(1)  # HIGH = OFF
-            print("  Weather LED OFF")
-            time.sleep(0.5)
-            
-        # Test LED 3 (pin 15)
-        print("Testing LED 3 (On Air LED, pin 15)...")
-        for i in range(3):
-            self.on_air_led.value(0)  # LOW = ON
-            print("  On Air LED ON")
-            time.sleep(0.5)
-            self.on_air_led.value(1)  # HIGH = OFF
-            print("  On Air LED OFF")
-            time.sleep(0.5)
-        
+        for name, idx, pin, on_value in self._test_outputs[:3]:
+            await self._blink(idx, pin, name, on_value, 3)
         print("Individual LED test complete!")
     
+    async def _run_test(self, test):
+        """Run an output test with the sensor loop paused so both don't drive the pins"""
+        if self._testing:
+            return
+        self._testing = True
+        try:
+            await test()
+        finally:
+            self._testing = False
+    
+    def _start_test(self, test):
+        """Start an output test in the background so the HTTP response returns immediately"""
+        asyncio.create_task(self._run_test(test))
+    
     def generate_html(self, sensors):
-        """Generate enhanced web interface with DHT11 data"""
-        presence_class = "sensor-active" if sensors['presence'] else "sensor-inactive"
-        presence_text = "YES" if sensors['presence'] else "NO"
-        
-        storm_class = "sensor-active" if sensors['storm'] else "sensor-inactive"  
-        storm_text = "YES" if sensors['storm'] else "NO"
+        """Generate enhanced web interface with DHT11 data - returns page chunks as bytes in send order"""
+        # Sensor block only changes with state - reuse the last render while it holds
+        key = self._state_key(sensors)
+        if key != self._status_key:
+            self._status_html = self._render_status(sensors)
+            self._status_key = key
         
-        clouds_class = "sensor-active" if sensors['clouds'] else "sensor-inactive"
-        clouds_text = "YES" if sensors['clouds'] else "NO"
+        # Info block only changes with the IP or thresholds - uptime is the one per-request value
+        info_key = (self.ip_address, self.humidity_threshold, self.temp_min, self.temp_max)
+        if info_key != self._info_key:
+            self._render_info()
+            self._info_key = info_key
         
-        antenna_class = "sensor-active" if sensors['antenna_connected'] else "sensor-inactive"
-        antenna_text = "CONNECTED" if sensors['antenna_connected'] else "DISCONNECTED"
-        
-        on_air_class = "sensor-active" if sensors.get('on_air', False) else "sensor-inactive"
-        on_air_text = "ON AIR" if sensors.get('on_air', False) else "OFF AIR"
+        return (_HTML_HEAD, self._status_html, _HTML_MID, self._info_head,
+                str(sensors['timestamp'] // 1000).encode(), self._info_tail, _HTML_TAIL)
+    
+    def _render_info(self):
+        """Render the info block as the bytes before and after the uptime value"""
+        self._info_head = (_INFO_HEAD_TEMPLATE % self.ip_address).encode('utf-8')
+        self._info_tail = (_INFO_TAIL_TEMPLATE % (self.humidity_threshold, self.temp_min,
+                                                  self.temp_max)).encode('utf-8')
+    
+    def _state_key(self, sensors):
+        """Everything shown for the sensors except the timestamp, as a comparable tuple"""
+        return (sensors['presence'], sensors['storm'], sensors['clouds'],
+                sensors['antenna_connected'], sensors['on_air'], sensors['temperature'],
+                sensors['humidity'], sensors['weather_status'], sensors['dht_status'],
+                sensors['control_reason'], tuple(sensors['manual_overrides'].values()))
+    
+    def _state_json_head(self, sensors):
+        """Return the sensor state as JSON bytes up to the timestamp value, cached per state"""
+        key = self._state_key(sensors)
+        if key != self._json_key:
+            # Serialise everything but the timestamp once, leaving the object open for it
+            timestamp = sensors.pop('timestamp')
+            try:
+                self._json_head = (json.dumps(sensors)[:-1] + ', "timestamp": ').encode('utf-8')
+            finally:
+                sensors['timestamp'] = timestamp
+            self._json_key = key
+        return self._json_head
+    
+    def _render_status(self, sensors):
+        """Render the sensor, weather and logic block as bytes"""
+        # Sensor flags index the class/label tables directly
+        presence = int(sensors['presence'])
+        storm = int(sensors['storm'])
+        clouds = int(sensors['clouds'])
+        antenna = int(sensors['antenna_connected'])
+        on_air = int(sensors['on_air'])
         
         # DHT11 data formatting
-        temp = sensors.get('temperature')
-        humidity = sensors.get('humidity')
-        weather_status = sensors.get('weather_status', 'Unknown')
+        temp = sensors['temperature']
+        humidity = sensors['humidity']
+        weather_status = sensors['weather_status']
         
         temp_text = f"{temp}°C" if temp is not None else "Error"
         humidity_text = f"{humidity}%" if humidity is not None else "Error"
         
-        uptime = sensors['timestamp'] // 1000
-        reason = sensors.get('control_reason', 'Unknown')
-        overrides = sensors.get('manual_overrides', {})
+        reason = sensors['control_reason']
+        overrides = sensors['manual_overrides']
         
         override_status = ""
         logic_box_class = "logic-box"
@@ -423,326 +930,203 @@ class EnhancedStormSensor:
                 override_status = f"<br><strong>Manual Overrides Active:</strong> {', '.join(active_overrides)}"
                 logic_box_class += " override-active"
         
-        html = """<!DOCTYPE html>
-<html>
-<head>
-    <title>Enhanced Storm Sensor System</title>
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <style>
-        body { font-family: Arial, sans-serif; margin: 0; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; }
-        .container { max-width: 700px; margin: 0 auto; background: rgba(255,255,255,0.95); padding: 30px; border-radius: 15px; box-shadow: 0 8px 32px rgba(0,0,0,0.3); color: #333; }
-        .header { text-align: center; margin-bottom: 30px; }
-        .sensor { padding: 20px; margin: 10px 0; border-radius: 10px; display: flex; justify-content: space-between; align-items: center; font-size: 18px; font-weight: bold; }
-        .sensor-active { background: linear-gradient(135deg, #4CAF50, #45a049); color: white; box-shadow: 0 4px 15px rgba(76, 175, 80, 0.4); }
-        .sensor-inactive { background: linear-gradient(135deg, #f44336, #da190b); color: white; box-shadow: 0 4px 15px rgba(244, 67, 54, 0.4); }
-        .controls { text-align: center; margin: 30px 0; }
-        .control-section { margin: 20px 0; padding: 20px; background: #f8f9fa; border-radius: 10px; }
-        .btn { padding: 12px 24px; margin: 5px; border: none; border-radius: 8px; cursor: pointer; font-size: 16px; font-weight: bold; transition: transform 0.2s, box-shadow 0.2s; }
-        .btn:hover { transform: translateY(-2px); box-shadow: 0 4px 12px rgba(0,0,0,0.2); }
-        .btn-on { background: #4CAF50; color: white; }
-        .btn-off { background: #f44336; color: white; }
-        .btn-test { background: #FF9800; color: white; }
-        .btn-refresh { background: #2196F3; color: white; }
-        .status-bar { margin-top: 30px; padding: 20px; border-top: 3px solid #eee; font-size: 14px; color: #666; background: #f8f9fa; border-radius: 10px; }
-        .logic-box { background: #e3f2fd; padding: 15px; border-radius: 8px; margin: 15px 0; border-left: 4px solid #2196F3; }
-        .override-active { background: #fff3e0; border-left: 4px solid #FF9800; }
-        .pin-info { background: #fff3e0; padding: 10px; border-radius: 5px; font-size: 12px; margin: 10px 0; }
-        .weather-info { background: #e8f5e8; padding: 15px; border-radius: 8px; margin: 15px 0; border-left: 4px solid #4CAF50; }
-        .weather-data { display: flex; justify-content: space-between; margin: 10px 0; }
-        .weather-value { font-weight: bold; color: #2e7d32; }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>Enhanced Storm Sensor System</h1>
-            <p>Smart Antenna Control with Weather Monitoring</p>
-            <div class="pin-info">
-                <strong>Hardware:</strong> LEDs on pins 0, 2, 15 (LOW = ON) | Antenna on pin """ + str(ANTENNA_PIN) + """ | DHT11 on pin """ + str(DHT11_PIN) + """
-            </div>
-        </div>
-        
-        <div class="sensor """ + presence_class + """">
-            <span>Person Detected</span>
-            <span>""" + presence_text + """</span>
-        </div>
-        
-        <div class="sensor """ + storm_class + """">
-            <span>Storm Detected</span>
-            <span>""" + storm_text + """</span>
-        </div>
-        
-        <div class="sensor """ + clouds_class + """">
-            <span>Poor Weather (DHT11)</span>
-            <span>""" + clouds_text + """</span>
-        </div>
-        
-        <div class="sensor """ + antenna_class + """">
-            <span>Antenna Status</span>
-            <span>""" + antenna_text + """</span>
-        </div>
-        
-        <div class="sensor """ + on_air_class + """">
-            <span>On Air Status</span>
-            <span>""" + on_air_text + """</span>
-        </div>
-        
-        <div class="weather-info">
-            <h3 style="margin-top: 0;">DHT11 Weather Data</h3>
-            <div class="weather-data">
-                <span>Temperature:</span>
-                <span class="weather-value">""" + temp_text + """</span>
-            </div>
-            <div class="weather-data">
-                <span>Humidity:</span>
-                <span class="weather-value">""" + humidity_text + """</span>
-            </div>
-            <div style="margin-top: 10px; font-size: 14px; font-style: italic;">
-                """ + weather_status + """
-            </div>
-        </div>
+        status = _STATUS_TEMPLATE % (_CLASS[presence], _YN[presence], _CLASS[storm], _YN[storm],
+                                     _CLASS[clouds], _YN[clouds], _CLASS[antenna], _ANT[antenna],
+                                     _CLASS[on_air], _AIR[on_air], temp_text, humidity_text,
+                                     weather_status, logic_box_class, reason + override_status)
         
-        <div class=\"""" + logic_box_class + """\">
-            <strong>Current Logic:</strong> """ + reason + override_status + """
-        </div>
+        return status.encode('utf-8')
+    
+    def _header(self, prefix, length):
+        """Fill the reused buffer with a response header - returns a view of it"""
+        return self._tx_mv[:_put_header(self._tx_mv, prefix, length)]
+    
+    def _json_response(self, sensors):
+        """Assemble the whole JSON state response in the reused buffer - returns a view of it"""
+        head = self._state_json_head(sensors)
+        timestamp = sensors['timestamp']
+        length = len(head) + _digits(timestamp) + 1
         
-        <div class="controls">
-            <div class="control-section">
-                <h3>Antenna Control</h3>
-                <button class="btn btn-on" onclick="controlDevice('antenna', 'on')">Connect Antenna</button>
-                <button class="btn btn-off" onclick="controlDevice('antenna', 'off')">Disconnect Antenna</button>
-            </div>
-            
-            <div class="control-section">  
-                <h3>LED Control (Persistent - LOW = ON)</h3>
-                <button class="btn btn-test" onclick="controlDevice('storm_led', 'on')">Storm LED ON (pin 0)</button>
-                <button class="btn btn-test" onclick="controlDevice('storm_led', 'off')">Storm LED OFF</button>
-                <br>
-                <button class="btn btn-test" onclick="controlDevice('clouds_led', 'on')">Weather LED ON (pin 2)</button>
-                <button class="btn btn-test" onclick="controlDevice('clouds_led', 'off')">Weather LED OFF</button>
-                <br>
-                <button class="btn btn-test" onclick="controlDevice('on_air_led', 'on')">On Air LED ON (pin 15)</button>
-                <button class="btn btn-test" onclick="controlDevice('on_air_led', 'off')">On Air LED OFF</button>
-                <br>
-                <button class="btn btn-test" onclick="controlDevice('test_all', '')">Test All Outputs</button>
-                <button class="btn btn-test" onclick="controlDevice('test_individual', '')">Test Individual LEDs</button>
-            </div>
-            
-            <div class="control-section">
-                <h3>System Control</h3>
-                <button class="btn btn-refresh" onclick="location.reload()">Refresh Status</button>
-                <button class="btn btn-test" onclick="controlDevice('reset_overrides', '')">Reset Manual Overrides</button>
-            </div>
-        </div>
+        # Grow the buffer once if the state ever outgrows it (header digits + blank line <= 14 bytes)
+        size = len(_HDR_JSON) + 14 + length
+        if size > len(self._tx_buf):
+            self._tx_buf = bytearray(size + 64)
+            self._tx_mv = memoryview(self._tx_buf)
         
-        <div class="status-bar">
-            <h4>System Information</h4>
-            <p><strong>IP Address:</strong> """ + str(self.ip_address) + """</p>
-            <p><strong>Uptime:</strong> """ + str(uptime) + """ seconds</p>
-            <p><strong>Pin Configuration (DHT11 INTEGRATION):</strong></p>
-            <ul style="text-align: left; margin: 10px 0; font-size: 12px;">
-                <li>Storm LED: GPIO """ + str(LED1_PIN) + """ (LOW = ON)</li>
-                <li>Clouds LED: GPIO """ + str(LED2_PIN) + """ (LOW = ON)</li>
-                <li>On Air LED: GPIO """ + str(LED3_PIN) + """ (LOW = ON)</li>
-                <li>Antenna Relay: GPIO """ + str(ANTENNA_PIN) + """ (HIGH = ON)</li>
-                <li>DHT11 Sensor: GPIO """ + str(DHT11_PIN) + """ (Temp & Humidity)</li>
-            </ul>
-            <p><strong>Weather Thresholds:</strong></p>
-            <ul style="text-align: left; margin: 10px 0; font-size: 12px;">
-                <li>Poor Weather: Humidity >""" + str(self.humidity_threshold) + """% OR Temp <""" + str(self.temp_min) + """°C OR >""" + str(self.temp_max) + """°C</li>
-                <li>Good Weather: Normal temp/humidity ranges</li>
-            </ul>
-            <p><strong>Control Logic:</strong></p>
-            <ul style="text-align: left; margin: 10px 0;">
-                <li><strong>Storm = Antenna OFF</strong> (safety first!)</li>
-                <li><strong>No Person = Antenna OFF</strong> (no need)</li>
-                <li><strong>Person + No Storm = Antenna ON</strong> (even if cloudy)</li>
-            </ul>
-            <p><strong>Manual Override System:</strong></p>
-            <ul style="text-align: left; margin: 10px 0; font-size: 12px;">
-                <li>Manual LED/antenna control persists until reset</li>
-                <li>Overridden components ignore sensor readings</li>
-                <li>Use "Reset Manual Overrides" to return to automatic</li>
-            </ul>
-        </div>
-    </div>
+        mv = self._tx_mv
+        pos = _put_header(mv, _HDR_JSON, length)
+        end = pos + len(head)
+        mv[pos:end] = head
+        end = _put_int(mv, end, timestamp)
+        mv[end] = 125  # '}'
+        return mv[:end + 1]
     
-    <script>
-        function controlDevice(device, action) {
-            let url = '';
-            if (device === 'antenna') {
-                url = '/antenna/' + action;
-            } else if (device.includes('led')) {
-                url = '/led/' + device.replace('_led', '') + '/' + action;
-            } else if (device === 'test_all') {
-                url = '/test/outputs';
-            } else if (device === 'test_individual') {
-                url = '/test/individual';
-            } else if (device === 'reset_overrides') {
-                url = '/reset/overrides';
-            }
-            
-            if (url) {
-                fetch(url)
-                    .then(response => response.text())
-                    .then(result => {
-                        console.log('Control result:', result);
-                        setTimeout(() => location.reload(), 500);
-                    })
-                    .catch(err => console.log('Control error:', err));
-            }
-        }
+    async def _handle_client(self, reader, writer):
+        """Handle HTTP requests - the connection stays open for the next poll until it idles out"""
+        # Send the small responses straight away instead of waiting on Nagle - not every port has it
+        try:
+            writer.s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except:
+            pass
+        
+        # One fixed receive buffer per connection - a request line that doesn't fit is rejected, never grown
+        rx = self._rx_free.pop() if self._rx_free else bytearray(MAX_REQUEST_LINE)
+        rxv = memoryview(rx)
+        have = 0  # Bytes of the next request already in rx
         
-        // Auto-refresh every 3 seconds
-        setInterval(() => location.reload(), 3000);
-    </script>
-</body>
-</html>"""
-        return html
-    
-    def handle_request(self, client_socket):
-        """Handle HTTP requests with new endpoints"""
         try:
-            request = client_socket.recv(1024).decode('utf-8')
-            if not request:
-                return
-            
-            # Parse request path
-            request_line = request.split('\r\n')[0]
-            if ' ' in request_line:
-                parts = request_line.split(' ')
-                if len(parts) >= 2:
-                    path = parts[1]
-                else:
-                    path = '/'
-            else:
-                path = '/'
-            
-            # Update sensors and logic
-            sensors = self.update_logic()
-            
-            # Route handling
-            if path == '/':
-                html = self.generate_html(sensors)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nConnection: close\r\n\r\n" + html
-                
-            elif path == '/antenna/on':
-                self.control_antenna(True)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nAntenna Connected"
-                
-            elif path == '/antenna/off':
-                self.control_antenna(False)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nAntenna Disconnected"
-                
-            elif path == '/led/storm/on':
-                self.control_led('storm', True)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nStorm LED ON"
-                
-            elif path == '/led/storm/off':
-                self.control_led('storm', False)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nStorm LED OFF"
-                
-            elif path == '/led/clouds/on':
-                self.control_led('clouds', True)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nClouds LED ON"
-                
-            elif path == '/led/clouds/off':
-                self.control_led('clouds', False)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nClouds LED OFF"
+            while True:
+                # Read until the request line is complete, dropping connections that sit idle or stall
+                end = _find(rx, 10, 0, have)
+                while end < 0 and have < MAX_REQUEST_LINE:
+                    try:
+                        got = await asyncio.wait_for_ms(reader.readinto(rxv[have:]), KEEPALIVE_IDLE_MS)
+                    except asyncio.TimeoutError:
+                        got = 0
+                    if not got:
+                        break
+                    end = _find(rx, 10, have, have + got)
+                    have += got
+                if end < 0:
+                    # Oversized or unterminated - an idle connection is just closed
+                    if have:
+                        await writer.awrite(_R_BAD_REQUEST)
+                    break
                 
-            elif path == '/led/on_air/on':
-                self.control_led('on_air', True)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nOn Air LED ON"
+                # A bare LF is not a valid line ending either
+                if end == 0 or rx[end - 1] != 13:
+                    await writer.awrite(_R_BAD_REQUEST)
+                    break
                 
-            elif path == '/led/on_air/off':
-                self.control_led('on_air', False)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nOn Air LED OFF"
+                # Parse request path straight from the raw "GET /path HTTP/1.1" bytes
+                sp1 = _find(rx, 32, 0, end)
+                sp2 = _find(rx, 32, sp1 + 1, end) if sp1 > 0 else -1
+                path = bytes(rxv[sp1 + 1:sp2]) if sp2 > sp1 else b'/'
                 
-            elif path == '/test/outputs':
-                self.test_all_outputs()
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nOutput test completed"
+                # Skip the request headers - no endpoint uses them - reading them into the same buffer
+                found = _blank_line(rx, end + 1, have, -1)
+                total = have
+                while found < 0 and total <= MAX_HEADER_BYTES:
+                    try:
+                        have = await asyncio.wait_for_ms(reader.readinto(rxv), KEEPALIVE_IDLE_MS)
+                    except asyncio.TimeoutError:
+                        have = 0
+                    if not have:
+                        break
+                    found = _blank_line(rx, 0, have, found)
+                    total += have
+                if found < 0:
+                    # Oversized, stalled or closed - just drop it; a 400 here would be lost to the reset
+                    # that closing over unread headers sends
+                    break
                 
-            elif path == '/test/individual':
-                self.test_individual_leds()
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nIndividual LED test completed"
+                # Keep anything sent after the blank line for the next request
+                rest = have - found - 1
+                if rest:
+                    rx[:rest] = rx[found + 1:have]
+                have = rest
                 
-            elif path == '/reset/overrides':
-                self.reset_manual_overrides()
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nManual overrides reset - back to automatic"
+                # Sensor state comes from the background sensor loop
+                sensors = self._sensors
                 
-            elif path == '/api/status':
-                json_data = json.dumps(sensors)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n\r\n" + json_data
+                # Route handling - fixed control endpoints come from the route table
+                route = self._routes.get(path)
+                if route:
+                    handler, args, response = route
+                    handler(*args)
+                    await writer.awrite(response)
+                    
+                elif path == b'/':
+                    chunks = self.generate_html(sensors)
+                    length = 0
+                    for chunk in chunks:
+                        length += len(chunk)
+                    await writer.awrite(self._header(_HDR_HTML, length))
+                    for chunk in chunks:
+                        await _send(writer, chunk)
+                    
+                elif path == b'/api/status' or path == b'/api/state':
+                    await writer.awrite(self._json_response(sensors))
+                    
+                else:
+                    await writer.awrite(_R_NOT_FOUND)
                 
-            else:
-                response = "HTTP/1.1 404 NOT FOUND\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\n404 - Not Found"
-            
-            client_socket.send(response.encode('utf-8'))
+                # Collect between requests only when the heap is tight - gc.threshold covers the rest
+                if gc.mem_free() < GC_FREE_BYTES:
+                    gc.collect()
+                    free = gc.mem_free()
+                    if free < LOW_MEMORY_BYTES:
+                        print("Low memory: %d bytes free" % free)
             
         except Exception as e:
-            print(f"Request handling error: {e}")
+            print("Request handling error: %s" % e)
             try:
-                error_response = "HTTP/1.1 500 INTERNAL SERVER ERROR\r\nConnection: close\r\n\r\nServer Error"
-                client_socket.send(error_response.encode('utf-8'))
+                await writer.awrite(_R_SERVER_ERROR)
             except:
                 pass
         finally:
+            self._rx_free.append(rx)
             try:
-                client_socket.close()
+                await writer.aclose()
             except:
                 pass
     
-    def run_server(self):
+    async def _sensor_loop(self):
+        """Run the sensor/antenna logic on a timer, independent of HTTP traffic"""
+        while True:
+            if not self._testing:
+                # One clock read per tick, shared by every sensor and rate limiter
+                self.update_logic(time.ticks_ms())
+            await asyncio.sleep_ms(SENSOR_INTERVAL_MS)
+    
+    async def run_server(self):
         """Start the enhanced web server"""
-        if not self.connect_wifi():
+        # Sensors and antenna logic keep running while WiFi connects - a task left over from an
+        # earlier run is still queued, so only the first call starts one
+        if self._sensor_task is None:
+            self._sensor_task = asyncio.create_task(self._sensor_loop())
+        
+        if not await self.connect_wifi():
             return False
         
         try:
-            server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            server_socket.bind(('', 80))
-            server_socket.listen(1)
+            # Queue a few connections so a second tab doesn't get refused while one is served
+            server = await asyncio.start_server(self._handle_client, '0.0.0.0', 80, backlog=4)
             
             print(f"Enhanced Storm Sensor running at http://{self.ip_address}")
             print("Server ready! Auto-running on boot...")
             print("Press Ctrl+C to stop server")
             
-            while True:
-                try:
-                    gc.collect()  # Free memory periodically
-                    client_socket, client_addr = server_socket.accept()
-                    self.handle_request(client_socket)
-                except OSError as e:
-                    if e.args[0] == 4:  # Ctrl+C
-                        print("Server stopped by user")
-                        break
-                except Exception as e:
-                    print(f"Server error: {e}")
-                    continue
-                    
+            await server.wait_closed()
+        
         except Exception as e:
             print(f"Server startup error: {e}")
-        finally:
-            try:
-                server_socket.close()
-            except:
-                pass
         
         return True
 
 # Auto-start function for boot
+# Single shared instance - created on first use so the pins are only set up once
+_system = None
+
+def get_system():
+    """Return the shared EnhancedStormSensor, creating it on first call"""
+    global _system
+    if _system is None:
+        _system = EnhancedStormSensor()
+    return _system
+
 def auto_start():
     """Auto-start function - runs when ESP32 boots"""
     try:
         print("Auto-starting Enhanced Storm Sensor...")
-        system = EnhancedStormSensor()
+        system = get_system()
         
         # Test all outputs briefly on startup
         print("Quick startup test...")
-        system.test_all_outputs()
+        asyncio.run(system.test_all_outputs())
         
         # Start the server
-        system.run_server()
+        asyncio.run(system.run_server())
         
     except KeyboardInterrupt:
         print("Startup interrupted by user")
@@ -765,8 +1149,7 @@ def auto_start():
 # Main execution - Always auto-start when saved as main.py
 def main():
     """Main function - auto-starts the storm sensor system"""
-    system = EnhancedStormSensor()
-    system.run_server()
+    asyncio.run(get_system().run_server())
 
 # Auto-start immediately when this file runs
 print("=== AUTO-STARTING STORM SENSOR SYSTEM ===")
@@ -6,18 +6,237 @@ Reads presence and storm sensors, controls antenna relay via web interface
 import network
 import socket
 import machine
+import micropython
+from micropython import const
 import time
-import json
+import asyncio
+import io
+
+# Gzip support for the page - needs a firmware built with deflate compression
+try:
+    import deflate
+except ImportError:
+    deflate = None
 
 # Configuration
 WIFI_SSID = "AdrianWiFi"
 WIFI_PASSWORD = "bbbbbbbb"
 
 # Pin Configuration
-PIR_PIN = 4
-STORM_PIN = 5
-ANTENNA_PIN = 2
-LED_PIN = 23
+PIR_PIN = const(4)
+STORM_PIN = const(5)
+ANTENNA_PIN = const(2)
+LED_PIN = const(23)
+
+# Control loop period - the sensor IRQs cover edges, this catches anything else
+CONTROL_INTERVAL_MS = const(100)
+
+# Light-sleep this long between control passes while no client is connected (0 = never).
+# Saves power on sparse sites, but requests arriving mid-sleep wait for the wake-up and the
+# WiFi link can drop - leave at 0 unless the board runs from a battery.
+LIGHT_SLEEP_MS = const(0)
+
+# Longest request line read - every route is well under this
+MAX_REQUEST_LINE = const(256)
+
+# Request headers are read and thrown away before replying, so closing doesn't reset the
+# connection - but only up to this much, and only while the client keeps sending.
+# A client that sends nothing for HEADER_TIMEOUT_MS, request line included, is dropped.
+MAX_HEADER_BYTES = const(2048)
+HEADER_TIMEOUT_MS = const(2000)
+
+# Comment line sent to idle /events clients so dropped connections get noticed
+EVENTS_PING_MS = const(15000)
+
+# Page up to the IP address, with the sensor classes and labels left as %s
+_HTML_TOP = """<!DOCTYPE html>
+<html>
+<head>
+    <title>Storm Sensor System</title>
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <link rel="stylesheet" href="/s.css">
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Storm Sensor System</h1>
+            <p>Automatic Antenna Control</p>
+        </div>
+        
+        <div id="presence-box" class="sensor %s">
+            <span>Person Detected</span>
+            <span id="presence">%s</span>
+        </div>
+        
+        <div id="storm-box" class="sensor %s">
+            <span>Storm Detected</span>
+            <span id="storm">%s</span>
+        </div>
+        
+        <div id="antenna-box" class="sensor %s">
+            <span>Antenna Status</span>
+            <span id="antenna">%s</span>
+        </div>
+        
+        <div class="controls">
+            <h3>Manual Control</h3>
+            <button class="btn btn-on" onclick="controlAntenna('on')">Connect Antenna</button>
+            <button class="btn btn-off" onclick="controlAntenna('off')">Disconnect Antenna</button>
+            <br><br>
+            <button class="btn btn-refresh" onclick="location.reload()">Refresh Status</button>
+        </div>
+        
+        <div class="status-bar">
+            <p><strong>System IP:</strong> """
+
+_HTML_UPTIME = b"""</p>
+            <p><strong>Uptime:</strong> <span id="uptime">"""
+
+_HTML_TAIL = b"""</span> seconds</p>
+            <p><strong>Logic:</strong> Antenna connects when person present AND no storm</p>
+        </div>
+    </div>
+    
+    <script src="/s.js"></script>
+</body>
+</html>"""
+
+# Stylesheet and script, served separately so browsers cache them instead of
+# re-downloading with every page - rename the routes if either ever changes
+_CSS = b"""body { font-family: Arial, sans-serif; margin: 0; padding: 20px; background: #f5f5f5; }
+.container { max-width: 600px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }
+.header { text-align: center; margin-bottom: 30px; }
+.sensor { padding: 20px; margin: 10px 0; border-radius: 8px; display: flex; justify-content: space-between; align-items: center; font-size: 18px; font-weight: bold; }
+.sensor-active { background: #4CAF50; color: white; }
+.sensor-inactive { background: #f44336; color: white; }
+.controls { text-align: center; margin: 20px 0; }
+.btn { padding: 12px 24px; margin: 0 10px; border: none; border-radius: 6px; cursor: pointer; font-size: 16px; font-weight: bold; }
+.btn-on { background: #4CAF50; color: white; }
+.btn-off { background: #f44336; color: white; }
+.btn-refresh { background: #2196F3; color: white; }
+.status-bar { margin-top: 30px; padding-top: 20px; border-top: 2px solid #eee; font-size: 14px; color: #666; text-align: center; }
+"""
+
+_JS = b"""function controlAntenna(action) {
+    fetch('/antenna/' + action)
+        .then(response => response.text())
+        .catch(err => console.log('Control error:', err));
+}
+
+function setSensor(id, active, text) {
+    document.getElementById(id + '-box').className = 'sensor ' + (active ? 'sensor-active' : 'sensor-inactive');
+    document.getElementById(id).textContent = text;
+}
+
+// The server pushes the status whenever it changes - no page reloads
+const es = new EventSource('/events');
+es.onmessage = e => {
+    const s = JSON.parse(e.data);
+    setSensor('presence', s.presence, s.presence ? 'YES' : 'NO');
+    setSensor('storm', s.storm, s.storm ? 'YES' : 'NO');
+    setSensor('antenna', s.antenna_connected, s.antenna_connected ? 'CONNECTED' : 'DISCONNECTED');
+    document.getElementById('uptime').textContent = Math.floor(s.timestamp / 1000);
+};
+"""
+
+# Pre-encoded response headers and fixed responses
+_HDR_HTML = b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nConnection: close\r\n\r\n"
+_HDR_HTML_GZ = b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Encoding: gzip\r\nConnection: close\r\n\r\n"
+_HDR_JSON = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n\r\n"
+_HDR_TXT = b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\n"
+_HDR_EVENTS = b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n"
+_HDR_CACHED = b"\r\nCache-Control: max-age=31536000, immutable\r\nConnection: close\r\n\r\n"
+_RESP_CSS = b"HTTP/1.1 200 OK\r\nContent-Type: text/css" + _HDR_CACHED + _CSS
+_RESP_JS = b"HTTP/1.1 200 OK\r\nContent-Type: application/javascript" + _HDR_CACHED + _JS
+_RESP_ON = _HDR_TXT + b"Antenna Connected"
+_RESP_OFF = _HDR_TXT + b"Antenna Disconnected"
+_RESP_400 = b"HTTP/1.1 400 BAD REQUEST\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\n400 - Bad Request"
+_RESP_404 = b"HTTP/1.1 404 NOT FOUND\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\n404 - Not Found"
+
+@micropython.native
+def _find(buf, byte, start, end):
+    """Index of byte in buf[start:end], or -1 - receive buffers are bytearrays without find()"""
+    for i in range(start, end):
+        if buf[i] == byte:
+            return i
+    return -1
+
+@micropython.native
+def _blank_line(buf, start, end, state):
+    """Index of the newline ending a blank line in buf[start:end], else -1 if the scan stopped
+    at the start of a line or -2 mid-line - pass that back in as state for the next piece"""
+    for i in range(start, end):
+        c = buf[i]
+        if c == 10:
+            if state == -1:
+                return i
+            state = -1
+        elif c != 13:
+            state = -2
+    return state
+
+@micropython.native
+def _parse_path(buf, n):
+    """Copy just the path out of the raw "GET /path HTTP/1.1" bytes in the receive buffer"""
+    sp1 = _find(buf, 32, 0, n)
+    sp2 = _find(buf, 32, sp1 + 1, n) if sp1 > 0 else -1
+    return bytes(memoryview(buf)[sp1 + 1:sp2]) if sp2 > sp1 else b'/'
+
+_AE = b'accept-encoding:'
+_GZ = b'gzip'
+
+@micropython.native
+def _gzip_scan(buf, start, end, state):
+    """Carry the search for gzip in an Accept-Encoding header over buf[start:end] - state is how much
+    of a line-start "accept-encoding:" has matched (0-16, -1 for any other line), then 16 plus how
+    much of "gzip" after it, and 20 once found - pass it back in for the next piece"""
+    for i in range(start, end):
+        if state == 20:
+            return 20
+        c = buf[i]
+        if c == 10:
+            state = 0
+        elif state < 0:
+            pass
+        elif state < 16:
+            state = state + 1 if c | 32 == _AE[state] else -1
+        elif c | 32 == _GZ[state - 16]:
+            state += 1
+        else:
+            state = 17 if c | 32 == 103 else 16
+    return state
+
+async def _skip_headers(reader, rx, start, n, state):
+    """Read and discard the request up to its blank line, reusing the receive buffer rx whose
+    first n bytes are already in - returns whether the client accepts gzip, or None if the
+    headers run past MAX_HEADER_BYTES or stall"""
+    found = _blank_line(rx, start, n, state)
+    gz = _gzip_scan(rx, start, n, 0 if state == -1 else -1)
+    rxv = memoryview(rx)
+    total = n
+    while found < 0:
+        if total > MAX_HEADER_BYTES:
+            return None
+        try:
+            got = await asyncio.wait_for_ms(reader.readinto(rxv), HEADER_TIMEOUT_MS)
+        except asyncio.TimeoutError:
+            return None
+        if not got:
+            break  # Client half-closed - nothing left to discard
+        found = _blank_line(rx, 0, got, found)
+        gz = _gzip_scan(rx, 0, got, gz)
+        total += got
+    return gz == 20
+
+# Fixed-schema JSON status, formatted directly instead of through json.dumps()
+_JSON_STATUS = '{"presence": %s, "storm": %s, "antenna_connected": %s, "timestamp": %d}'
+_JSON_BOOL = ("false", "true")
+
+# Rendered and encoded _HTML_TOP per (presence, storm, antenna_connected) - at most 8 entries
+_TEMPLATE_CACHE = {}
+
+# Gzipped whole pages per (presence, storm, antenna_connected, ip) - uptime is filled in by /events
+_GZIP_CACHE = {}
 
 class StormSensorSystem:
     def __init__(self):
@@ -31,259 +250,348 @@ class StormSensorSystem:
         self.antenna_relay.value(0)
         self.status_led.value(0)
         
+        # Route table: path bytes -> handler returning the response as bytes chunks
+        self._routes = {
+            b'/antenna/on': self._r_on,
+            b'/antenna/off': self._r_off,
+            b'/api/status': self._r_api,
+            b'/api/sensors': self._r_api,
+            b'/s.css': self._r_css,
+            b'/s.js': self._r_js
+        }
+        
+        # Open connections, including /events streams - light sleep only happens with none
+        self._clients = 0
+        
+        # Receive buffers handed back after each request, so the read path allocates nothing in steady state
+        self._rx_free = [bytearray(MAX_REQUEST_LINE)]
+        
+        # Serve the page gzipped until compression turns out to be unavailable
+        self._gzip = deflate is not None
+        
+        # Sensor levels kept current by the pin IRQs - read_sensors() uses these
+        self._presence = self.pir_sensor.value()
+        self._storm = self.storm_sensor.value()
+        
+        # Set by the sensor IRQs to wake the control task - safe to set from an IRQ
+        self._sensor_flag = asyncio.ThreadSafeFlag()
+        
+        # Bumped and pulsed by the control task whenever the reported state changes - see _stream_events()
+        self._state_version = 0
+        self._state_event = asyncio.Event()
+        
+        both = machine.Pin.IRQ_RISING | machine.Pin.IRQ_FALLING
+        self.pir_sensor.irq(trigger=both, handler=self._on_pir)
+        self.storm_sensor.irq(trigger=both, handler=self._on_storm)
+        
         # WiFi connection
         self.wlan = network.WLAN(network.STA_IF)
         self.ip_address = None
+        self._ip_bytes = b'None'  # Encoded once per connect for the page - see generate_html()
         
     def connect_wifi(self):
         """Connect to WiFi network"""
         self.wlan.active(True)
         
+        # No WiFi power save - keeps request latency low (older firmware lacks the option)
+        try:
+            self.wlan.config(pm=network.WLAN.PM_NONE)
+        except (AttributeError, ValueError):
+            pass
+        
         if not self.wlan.isconnected():
             self.wlan.connect(WIFI_SSID, WIFI_PASSWORD)
             
-            timeout = 15
-            while not self.wlan.isconnected() and timeout > 0:
-                time.sleep(1)
-                timeout -= 1
+            # Poll every 50 ms for up to 15 s so we continue as soon as the link is up
+            for _ in range(300):
+                if self.wlan.isconnected():
+                    break
+                time.sleep_ms(50)
         
         if self.wlan.isconnected():
             self.ip_address = self.wlan.ifconfig()[0]
+            self._ip_bytes = self.ip_address.encode()
             self.status_led.value(1)
             return True
         return False
     
+    def _on_pir(self, pin):
+        """PIR edge IRQ - record the new level and wake the control task"""
+        self._presence = pin.value()
+        self._sensor_flag.set()
+    
+    def _on_storm(self, pin):
+        """Storm sensor edge IRQ - record the new level and wake the control task"""
+        self._storm = pin.value()
+        self._sensor_flag.set()
+    
+    @micropython.native
     def read_sensors(self):
         """Read all sensor values"""
-        try:
-            presence = bool(self.pir_sensor.value())
-            storm = bool(self.storm_sensor.value())
-            antenna_connected = bool(self.antenna_relay.value())
-            
-            return {
-                'presence': presence,
-                'storm': storm,
-                'antenna_connected': antenna_connected,
-                'timestamp': time.ticks_ms()
-            }
-        except:
-            return {
-                'presence': False,
-                'storm': False,
-                'antenna_connected': False,
-                'timestamp': time.ticks_ms()
-            }
+        return {
+            'presence': bool(self._presence),
+            'storm': bool(self._storm),
+            'antenna_connected': bool(self.antenna_relay.value()),
+            'timestamp': time.ticks_ms()
+        }
     
+    @micropython.native
     def update_logic(self):
         """Apply control logic"""
-        try:
-            sensors = self.read_sensors()
-            should_connect = sensors['presence'] and not sensors['storm']
-            
-            if should_connect != sensors['antenna_connected']:
-                self.antenna_relay.value(1 if should_connect else 0)
-            
-            return sensors
-        except:
-            return self.read_sensors()
+        sensors = self.read_sensors()
+        should_connect = sensors['presence'] and not sensors['storm']
+        
+        if should_connect != sensors['antenna_connected']:
+            self.antenna_relay.value(1 if should_connect else 0)
+        
+        return sensors
     
     def control_antenna(self, connect):
         """Manual antenna control"""
-        try:
-            self.antenna_relay.value(1 if connect else 0)
-        except:
-            pass
+        self.antenna_relay.value(1 if connect else 0)
     
     def generate_html(self, sensors):
-        """Generate web interface HTML"""
-        # Simple string building to avoid f-string issues
-        presence_class = "sensor-active" if sensors['presence'] else "sensor-inactive"
-        presence_text = "YES" if sensors['presence'] else "NO"
-        
-        storm_class = "sensor-active" if sensors['storm'] else "sensor-inactive"  
-        storm_text = "YES" if sensors['storm'] else "NO"
-        
-        antenna_class = "sensor-active" if sensors['antenna_connected'] else "sensor-inactive"
-        antenna_text = "CONNECTED" if sensors['antenna_connected'] else "DISCONNECTED"
+        """Generate web interface HTML - returns bytes chunks in send order"""
+        # Sensor section only depends on the three flags - render each combination once
+        key = (sensors['presence'], sensors['storm'], sensors['antenna_connected'])
+        top = _TEMPLATE_CACHE.get(key)
+        if top is None:
+            presence_class = "sensor-active" if sensors['presence'] else "sensor-inactive"
+            presence_text = "YES" if sensors['presence'] else "NO"
+            
+            storm_class = "sensor-active" if sensors['storm'] else "sensor-inactive"  
+            storm_text = "YES" if sensors['storm'] else "NO"
+            
+            antenna_class = "sensor-active" if sensors['antenna_connected'] else "sensor-inactive"
+            antenna_text = "CONNECTED" if sensors['antenna_connected'] else "DISCONNECTED"
+            
+            top = (_HTML_TOP % (presence_class, presence_text, storm_class, storm_text,
+                                antenna_class, antenna_text)).encode('utf-8')
+            _TEMPLATE_CACHE[key] = top
         
         uptime = sensors['timestamp'] // 1000
         
-        html = """<!DOCTYPE html>
-<html>
-<head>
-    <title>Storm Sensor System</title>
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <style>
-        body { font-family: Arial, sans-serif; margin: 0; padding: 20px; background: #f5f5f5; }
-        .container { max-width: 600px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }
-        .header { text-align: center; margin-bottom: 30px; }
-        .sensor { padding: 20px; margin: 10px 0; border-radius: 8px; display: flex; justify-content: space-between; align-items: center; font-size: 18px; font-weight: bold; }
-        .sensor-active { background: #4CAF50; color: white; }
-        .sensor-inactive { background: #f44336; color: white; }
-        .controls { text-align: center; margin: 20px 0; }
-        .btn { padding: 12px 24px; margin: 0 10px; border: none; border-radius: 6px; cursor: pointer; font-size: 16px; font-weight: bold; }
-        .btn-on { background: #4CAF50; color: white; }
-        .btn-off { background: #f44336; color: white; }
-        .btn-refresh { background: #2196F3; color: white; }
-        .status-bar { margin-top: 30px; padding-top: 20px; border-top: 2px solid #eee; font-size: 14px; color: #666; text-align: center; }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>Storm Sensor System</h1>
-            <p>Automatic Antenna Control</p>
-        </div>
-        
-        <div class="sensor """ + presence_class + """">
-            <span>Person Detected</span>
-            <span>""" + presence_text + """</span>
-        </div>
-        
-        <div class="sensor """ + storm_class + """">
-            <span>Storm Detected</span>
-            <span>""" + storm_text + """</span>
-        </div>
-        
-        <div class="sensor """ + antenna_class + """">
-            <span>Antenna Status</span>
-            <span>""" + antenna_text + """</span>
-        </div>
-        
-        <div class="controls">
-            <h3>Manual Control</h3>
-            <button class="btn btn-on" onclick="controlAntenna('on')">Connect Antenna</button>
-            <button class="btn btn-off" onclick="controlAntenna('off')">Disconnect Antenna</button>
-            <br><br>
-            <button class="btn btn-refresh" onclick="location.reload()">Refresh Status</button>
-        </div>
-        
-        <div class="status-bar">
-            <p><strong>System IP:</strong> """ + str(self.ip_address) + """</p>
-            <p><strong>Uptime:</strong> """ + str(uptime) + """ seconds</p>
-            <p><strong>Logic:</strong> Antenna connects when person present AND no storm</p>
-        </div>
-    </div>
+        return (top, self._ip_bytes, _HTML_UPTIME, str(uptime).encode(), _HTML_TAIL)
     
-    <script>
-        function controlAntenna(action) {
-            fetch('/antenna/' + action)
-                .then(response => response.text())
-                .then(() => {
-                    setTimeout(() => location.reload(), 500);
-                })
-                .catch(err => console.log('Control error:', err));
-        }
+    def _r_index(self, sensors, gzip):
+        """Web page - gzipped once per state for clients that accept it, otherwise streamed chunk by chunk"""
+        if gzip and self._gzip:
+            key = (sensors['presence'], sensors['storm'], sensors['antenna_connected'], self.ip_address)
+            page = _GZIP_CACHE.get(key)
+            if page is None:
+                page = self._gzip_page(sensors)
+            if page is not None:
+                _GZIP_CACHE[key] = page
+                return (_HDR_HTML_GZ, page)
+        return (_HDR_HTML,) + self.generate_html(sensors)
+    
+    def _gzip_page(self, sensors):
+        """Compress the page with the uptime left blank - returns None if compression isn't available"""
+        chunks = self.generate_html(sensors)
+        try:
+            buf = io.BytesIO()
+            gz = deflate.DeflateIO(buf, deflate.GZIP)
+            # Every chunk but the uptime value (chunks[3]) - the first event fills that in
+            for chunk in chunks[:3]:
+                gz.write(chunk)
+            gz.write(chunks[4])
+            gz.close()
+            return buf.getvalue()
+        except Exception as e:
+            # Firmware without compression support - serve the plain page from now on
+            print(f"Gzip unavailable, serving plain HTML: {e}")
+            self._gzip = False
+            return None
+    
+    def _r_on(self, sensors):
+        """Connect the antenna manually"""
+        self.control_antenna(True)
+        return (_RESP_ON,)
+    
+    def _r_off(self, sensors):
+        """Disconnect the antenna manually"""
+        self.control_antenna(False)
+        return (_RESP_OFF,)
+    
+    def _r_css(self, sensors):
+        """Stylesheet - cached by the browser"""
+        return (_RESP_CSS,)
+    
+    def _r_js(self, sensors):
+        """Page script - cached by the browser"""
+        return (_RESP_JS,)
+    
+    def _status_json(self, sensors):
+        """Sensor status as JSON bytes"""
+        return (_JSON_STATUS % (_JSON_BOOL[sensors['presence']], _JSON_BOOL[sensors['storm']],
+                                _JSON_BOOL[sensors['antenna_connected']],
+                                sensors['timestamp'])).encode()
+    
+    def _r_api(self, sensors):
+        """Sensor status as JSON"""
+        return (_HDR_JSON, self._status_json(sensors))
+    
+    async def _stream_events(self, writer):
+        """Server-Sent Events - push the status now and then on every change until the client goes away"""
+        # Bound once - this loop lives as long as the client stays connected
+        awrite = writer.awrite
+        wait = self._state_event.wait
+        status_json = self._status_json
+        read_sensors = self.read_sensors
         
-        // Auto-refresh every 5 seconds
-        setInterval(() => location.reload(), 5000);
-    </script>
-</body>
-</html>"""
-        return html
+        await awrite(_HDR_EVENTS)
+        while True:
+            sent = self._state_version
+            await awrite(b'data: ')
+            await awrite(status_json(read_sensors()))
+            await awrite(b'\n\n')
+            
+            # Wait for a change (one made while writing counts too), pinging now and then so a dead client raises
+            while self._state_version == sent:
+                try:
+                    await asyncio.wait_for_ms(wait(), EVENTS_PING_MS)
+                except asyncio.TimeoutError:
+                    await awrite(b': ping\n\n')
     
-    def handle_request(self, client_socket):
+    async def handle_request(self, reader, writer):
         """Handle incoming HTTP requests"""
+        # Several small writes per page - don't let Nagle hold them back
+        try:
+            writer.s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (AttributeError, OSError):
+            pass
+        
+        self._clients += 1
+        # Connections overlap, so each one borrows its own buffer; a fresh one only when all are out
+        rx = self._rx_free.pop() if self._rx_free else bytearray(MAX_REQUEST_LINE)
         try:
-            request = client_socket.recv(1024).decode('utf-8')
-            if not request:
+            # Read until the request line is complete
+            rxv = memoryview(rx)
+            n = 0
+            end = -1
+            while end < 0 and n < MAX_REQUEST_LINE:
+                # A client that connects and never sends (browser preconnects) is dropped, not kept
+                try:
+                    got = await asyncio.wait_for_ms(reader.readinto(rxv[n:]), HEADER_TIMEOUT_MS)
+                except asyncio.TimeoutError:
+                    return
+                if not got:
+                    break
+                end = _find(rx, 10, n, n + got)
+                n += got
+            if not n:
+                return
+            if end < 0:
+                # Drain the rest as well, or the reset on close can swallow the 400
+                await _skip_headers(reader, rx, n, n, -2)
+                await writer.awrite(_RESP_400)
                 return
             
-            # Parse request - simplified like debug version
-            request_line = request.split('\r\n')[0]
-            if ' ' in request_line:
-                parts = request_line.split(' ')
-                if len(parts) >= 2:
-                    path = parts[1]
-                else:
-                    path = '/'
-            else:
-                path = '/'
+            path = _parse_path(rx, end)
+            
+            # Discard the headers - leaving them unread makes close() send a reset
+            gzip = await _skip_headers(reader, rx, end + 1, n, -1)
+            if gzip is None:
+                return  # Oversized or stalled - a 400 would be lost to the reset anyway
+            
+            # Event stream stays open - it is not a request/response route
+            if path == b'/events':
+                await self._stream_events(writer)
+                return
             
             # Update sensors and logic
             sensors = self.update_logic()
             
-            # Route handling - simple response building like debug version
-            if path == '/':
-                html = self.generate_html(sensors)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nConnection: close\r\n\r\n" + html
-                
-            elif path == '/antenna/on':
-                self.control_antenna(True)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nAntenna Connected"
-                
-            elif path == '/antenna/off':
-                self.control_antenna(False)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\nAntenna Disconnected"
-                
-            elif path == '/api/status' or path == '/api/sensors':
-                json_data = json.dumps(sensors)
-                response = "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n\r\n" + json_data
-                
+            # Route handling - each route returns its response as bytes chunks; the page also
+            # depends on whether the client takes gzip
+            if path == b'/':
+                chunks = self._r_index(sensors, gzip)
             else:
-                response = "HTTP/1.1 404 NOT FOUND\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\n404 - Not Found"
-            
-            client_socket.send(response.encode('utf-8'))
+                route = self._routes.get(path)
+                chunks = route(sensors) if route else (_RESP_404,)
+            awrite = writer.awrite
+            for chunk in chunks:
+                await awrite(chunk)
             
-        except Exception as e:
-            try:
-                error_response = "HTTP/1.1 500 INTERNAL SERVER ERROR\r\nConnection: close\r\n\r\nError"
-                client_socket.send(error_response.encode('utf-8'))
-            except:
-                pass
+        except OSError:
+            pass  # Client went away mid-request
         finally:
+            self._clients -= 1
+            self._rx_free.append(rx)
             try:
-                client_socket.close()
-            except:
+                await writer.aclose()
+            except OSError:
                 pass
     
+    async def _control_task(self):
+        """Re-run the control logic on every sensor edge (and periodically), notifying /events on changes"""
+        # Bound once - this loop runs for the life of the server
+        update_logic = self.update_logic
+        flag_wait = self._sensor_flag.wait
+        state_event = self._state_event
+        
+        last = None
+        while True:
+            if LIGHT_SLEEP_MS and not self._clients:
+                # Nobody connected - sleep the CPU, then pick up any edge the IRQs missed meanwhile
+                machine.lightsleep(LIGHT_SLEEP_MS)
+                self._presence = self.pir_sensor.value()
+                self._storm = self.storm_sensor.value()
+                await asyncio.sleep_ms(0)
+            else:
+                try:
+                    await asyncio.wait_for_ms(flag_wait(), CONTROL_INTERVAL_MS)
+                except asyncio.TimeoutError:
+                    pass
+            
+            sensors = update_logic()
+            state = (sensors['presence'], sensors['storm'], sensors['antenna_connected'])
+            if state != last:
+                last = state
+                self._state_version += 1
+                # Wakes every waiting client; clearing right away re-arms it for the next change
+                state_event.set()
+                state_event.clear()
+    
+    async def _serve(self):
+        """Start the control task and the HTTP server, then serve until stopped"""
+        asyncio.create_task(self._control_task())
+        server = await asyncio.start_server(self.handle_request, '0.0.0.0', 80)
+        print(f"Storm Sensor System running at http://{self.ip_address}")
+        await server.wait_closed()
+    
     def run_server(self):
         """Main server loop"""
         if not self.connect_wifi():
             return False
         
         try:
-            server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            server_socket.bind(('', 80))
-            server_socket.listen(1)
-            
-            print(f"Storm Sensor System running at http://{self.ip_address}")
-            
-            while True:
-                try:
-                    client_socket, client_addr = server_socket.accept()
-                    self.handle_request(client_socket)
-                except OSError as e:
-                    if e.args[0] == 4:  # Ctrl+C interrupt
-                        break
-                except:
-                    continue
-                    
-        except:
-            pass
-        finally:
-            try:
-                server_socket.close()
-            except:
-                pass
+            asyncio.run(self._serve())
+        except KeyboardInterrupt:
+            print("Server stopped")
         
         return True
 
+# Single shared instance - created on first use so importing this file doesn't touch the pins
+_system = None
+
+def get_system():
+    """Return the shared StormSensorSystem, creating it on first call"""
+    global _system
+    if _system is None:
+        _system = StormSensorSystem()
+    return _system
+
 # Main execution
 def main():
-    system = StormSensorSystem()
-    system.run_server()
+    get_system().run_server()
 
 # Auto-start when imported as main
 if __name__ == "__main__":
     main()
 
-# For manual control in Thonny
-storm_system = StormSensorSystem()
-
-# Manual commands available:
-# storm_system.connect_wifi()      # Connect to WiFi
-# storm_system.read_sensors()      # Read sensor values  
-# storm_system.control_antenna(True)   # Manual antenna control
-# storm_system.run_server()        # Start web server
\ No newline at end of file
+# Manual commands available in Thonny:
+# get_system().connect_wifi()      # Connect to WiFi
+# get_system().read_sensors()      # Read sensor values  
+# get_system().control_antenna(True)   # Manual antenna control
+# get_system().run_server()        # Start web server
\ No newline at end of file